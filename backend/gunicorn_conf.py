@@ -0,0 +1,31 @@
+# backend/gunicorn_conf.py
+# Production server config. Run from backend/:
+#   gunicorn -c gunicorn_conf.py main:app
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+
+def _usable_cpus() -> int:
+    # CPUs this process may run on (e.g. a container's cpuset), not every CPU on the host.
+    # CPU quotas (docker --cpus) aren't visible here, so set WEB_CONCURRENCY in containers.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# One Uvicorn worker process per slot, so requests are spread across all CPU cores.
+# Each worker runs its own lifespan (Gemini / ElevenLabs clients) and keeps its own
+# in-process caches such as the voices list.
+workers = int(os.getenv("WEB_CONCURRENCY", _usable_cpus() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Keep client connections open a little longer than typical load balancer idle timeouts (60s)
+keepalive = 65
+# For Uvicorn workers this is a heartbeat timeout: a worker whose event loop stops responding for this
+# long is restarted. It does not limit how long a request (e.g. a streamed podcast) may take.
+timeout = 120
+graceful_timeout = 30
+
+# Same env var the app reads for its own logger
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
@@ -1,58 +1,563 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.responses import StreamingResponse # For streaming audio
+from fastapi.responses import ORJSONResponse, FileResponse
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.background import BackgroundTask
+from starlette.types import ASGIApp, Receive, Scope, Send
 from dotenv import load_dotenv
 import os
 import re 
-from pydantic import BaseModel
+import logging
+import logging.handlers
+import queue
+import asyncio
+import collections
+import time
+import itertools
+import hashlib
+import secrets
+import stat
+import math
+import operator
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+import httpx
+from pydantic import BaseModel, Field, field_validator
 import google.generativeai as genai
 
-from pydub import AudioSegment # Import AudioSegment from pydub
-import io 
-
 from elevenlabs import Voice, VoiceSettings 
-from elevenlabs.client import ElevenLabs 
+from elevenlabs.client import AsyncElevenLabs 
+from elevenlabs.core import ApiError as ElevenLabsApiError
+from google.api_core import exceptions as google_exceptions
+from google.rpc import error_details_pb2
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 import json # For putting script into header
 from urllib.parse import quote # For safely encoding script text for header
 
+# Logging goes through a queue so handlers never block the event loop on stdout writes;
+# a background QueueListener thread (started in lifespan) does the actual I/O.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_queue: queue.Queue = queue.Queue(-1)
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+
 HOST_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"  # female
 GUEST_VOICE_ID = "pNInz6obpgDQGcFmaJgB" # male
+# Lowercased speaker label -> ElevenLabs voice id
+SPEAKER_VOICE_IDS: dict[str, str] = {
+    "host": HOST_VOICE_ID,
+    "guest": GUEST_VOICE_ID,
+}
 
-# load env variables
-load_dotenv()
+# ElevenLabs TTS settings shared by every segment. VoiceSettings is a Pydantic model, so build it once
+# instead of re-validating per request; use .model_copy(update=...) if a request ever needs overrides.
+ELEVEN_VOICE_SETTINGS = VoiceSettings(
+    stability=0.71,
+    similarity_boost=0.5, # Adjust for desired similarity to base voice
+    style=0.0, # Set to > 0 if using a voice with style exaggeration
+    use_speaker_boost=True
+)
+ELEVEN_MODEL_ID = "eleven_multilingual_v2" # Default model for ElevenLabs TTS, or your preferred model
+ELEVEN_OUTPUT_FORMAT = "mp3_44100_128" # Consistent high-quality MP3 format
+# Segments one podcast request synthesizes ahead of the one being streamed (bounded again process-wide by ELEVENLABS_MAX_INFLIGHT)
+TTS_CONCURRENT_REQUESTS = 3
 
-# get api key
-GOOGLE_GEMINI_API_KEY = os.getenv("GOOGLE_GEMINI_API_KEY")
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-# DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+VOICES_CACHE_TTL_SECONDS = 600 # The ElevenLabs voice catalog rarely changes
 
+# On-disk cache of synthesized segment MP3s, shared by all workers on the host and evicted
+# least-recently-used first once it grows past the cap. Override the location with the TTS_CACHE_DIR env var.
+TTS_CACHE_DIR_DEFAULT = os.path.join(os.path.expanduser("~"), ".cache", "ai-podcast", "tts")
+TTS_CACHE_MAX_BYTES = 500 * 1024 * 1024
+# Temp files from unfinished cache writes older than this are swept during eviction
+TTS_CACHE_STALE_TEMP_SECONDS = 600
 
-# config Google Gemini and create the model
-if GOOGLE_GEMINI_API_KEY:
-    genai.configure(api_key=GOOGLE_GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-else:
-    print("CRITICAL: GOOGLE_GEMINI_API_KEY not found. Script generation will fail.")
-    gemini_model = None 
-    
-# Configure ElevenLabs Client
-elevenlabs_client = None
-if ELEVENLABS_API_KEY:
+# In-process cache of generated scripts: exact topic repeats, or paraphrases whose topic
+# embeddings have at least this cosine similarity, reuse a script for up to an hour
+SCRIPT_CACHE_TTL_SECONDS = 3600
+SCRIPT_CACHE_MAX_ENTRIES = 256
+SCRIPT_CACHE_SIMILARITY_THRESHOLD = 0.92
+SCRIPT_EMBEDDING_MODEL = "models/text-embedding-004"
+SCRIPT_EMBEDDING_TIMEOUT_SECONDS = 5
+
+# The Gemini client retries unavailable errors itself for up to 10 minutes; turn that off so
+# provider_retry is the only retry layer and an outage can't hold a request (or a Gemini slot) that long
+GEMINI_REQUEST_OPTIONS = {"retry": None}
+
+# Scriptwriter instructions, identical for every request. The topic is only appended at the very end
+# (see _build_script_prompt) so the prompt starts with a stable prefix Gemini can reuse via implicit caching.
+SCRIPTWRITER_SYSTEM_PROMPT = """
+You are an expert podcast scriptwriter tasked with creating an engaging and well-structured conversational script.
+The podcast features a Host and a Guest discussing the topic given at the end of these instructions.
+
+Script Requirements:
+
+1.  Overall Length: The entire podcast should be approximately 3-4 minutes long when spoken (aim for around 450-550 words total for the script).
+2.  Speaker Labels: Clearly label each line with either "Host:" or "Guest:". Ensure there's a natural back-and-forth.
+3.  Structure:
+        Start (Host Introduction - approx. 30-60 seconds / 75-100 words):**
+            Host introduces the podcast show (you can invent a catchy show name related to general topics or the input topic).
+            Host briefly introduces the main topic.
+            Host introduces the Guest (you can invent a plausible expert name/title for the Guest based on the topic).
+        Mid (Host & Guest Conversation - approx. 2-3 minutes / 350-400 words):**
+            A dynamic conversation between the Host and Guest exploring 2-3 key aspects of the topic.
+            Host should ask insightful questions.
+            Guest should provide clear, informative, and engaging answers/perspectives.
+            Ensure a balanced dialogue.
+        End (Host Summary & Call to Action - approx. 30-60 seconds / 50-60 words):**
+            Host thanks the Guest for their insights.
+            Host provides a brief summary of the key takeaways from the discussion.
+            Host includes a call to action (e.g., "What are your thoughts? Find us on social media @[YourPodcastHandle]", "Don't forget to subscribe for more discussions like this.", "Visit our website at [yourwebsite.com] for more resources.").
+            Host signs off.
+4.  Readability and Formatting:
+        Use clear, concise language.
+        Ensure each speaker's line starts on a new line after their label (e.g., "Host:\nWelcome to...").
+        Use proper paragraph breaks within longer spoken segments for better visual organization if needed, but primarily focus on the speaker turns.
+        Avoid any meta-commentary about the script itself (e.g., "Here's the script:", "[Transition Music]"). Just provide the raw dialogue with speaker labels.
+
+Example Snippet of Expected Format:
+
+Host:
+Welcome back to "Future Forward," the podcast that decodes tomorrow's trends today! I'm your host, Alex.
+Today, we're diving deep into [the topic]. And to help us navigate this complex subject, we're thrilled to have Dr. Evelyn Reed, a leading researcher in [Guest's relevant field]. Evelyn, welcome to the show!
+
+Guest:
+Thanks for having me, Alex! It's a pleasure to be here.
+
+Host:
+Evelyn, to start us off, could you give our listeners a foundational understanding of "a key aspect of the topic"?
+
+Guest:
+Absolutely. Essentially, "Guest explains key aspect...""
+It's quite fascinating because...
+
+---
+
+Please generate the full script based on these requirements for the topic below.
+"""
+
+# Everything before the topic, built once so every request sends a byte-identical prefix
+_SCRIPT_PROMPT_PREFIX = f"{SCRIPTWRITER_SYSTEM_PROMPT}\nTopic: "
+
+# Shared by the regular and streaming script endpoints
+SCRIPT_GENERATION_CONFIG = genai.types.GenerationConfig(
+    max_output_tokens=1024, # ~550 words plus speaker labels, with headroom so the outro isn't cut off
+    candidate_count=1, # Only one script is ever used
+    temperature=0.7, # Adjust for creativity vs. factuality
+    top_p=0.95
+)
+# Override with the GEMINI_MODEL env var, e.g. "gemini-2.0-flash-lite" for lower latency at some cost in quality
+GEMINI_MODEL_NAME_DEFAULT = "gemini-2.0-flash"
+
+# Shared connection pool for outbound ElevenLabs calls (keep-alive + HTTP/2 multiplexing).
+# httpx drops idle connections after 5s by default, which would mean a fresh TCP+TLS handshake for
+# nearly every podcast request; keep them for a minute so bursts of requests reuse warm connections.
+OUTBOUND_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60)
+OUTBOUND_HTTP_TIMEOUT_SECONDS = 60
+# Upper bound on concurrent in-flight calls per provider (per worker), to stay under rate limits.
+# Override with the GEMINI_MAX_INFLIGHT / ELEVENLABS_MAX_INFLIGHT env vars.
+GEMINI_MAX_INFLIGHT_DEFAULT = 8
+ELEVENLABS_MAX_INFLIGHT_DEFAULT = 5
+# Retries for transient provider errors (429 / 5xx / dropped connections)
+PROVIDER_RETRY_ATTEMPTS = 3
+PROVIDER_RETRY_MAX_WAIT_SECONDS = 10
+# Number of independent connection pools to round-robin ElevenLabs calls over,
+# so concurrent streams don't all queue behind one HTTP/2 connection's flow-control window
+ELEVENLABS_CLIENT_POOL_SIZE = 4
+
+# Suggest a filename for the download
+# For simplicity, not making filename dynamic based on topic here as topic isn't passed to the audio endpoints
+PODCAST_AUDIO_HEADERS = {
+    "Content-Disposition": "attachment; filename=\"generated_podcast.mp3\"",
+    "Cache-Control": "no-store"
+}
+
+# Endpoints whose responses are already compressed (MP3) and must not be gzipped
+GZIP_EXCLUDED_PATHS = {"/api/generate-podcast-audio", "/api/generate-podcast"}
+
+
+def _is_retryable_provider_error(exc: BaseException) -> bool:
+    if isinstance(exc, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests,
+                        google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                        google_exceptions.DeadlineExceeded)):
+        return True
+    if isinstance(exc, ElevenLabsApiError):
+        detail = exc.body.get("detail") if isinstance(exc.body, dict) else None
+        if isinstance(detail, dict) and detail.get("status") == "quota_exceeded":
+            return False # Out of credits; retrying won't help
+        return exc.status_code == 429 or (exc.status_code or 0) >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def _retry_after_seconds(exc: BaseException | None) -> float | None:
+    """
+    Reads the retry delay Gemini attaches to a rate-limit error as a google.rpc.RetryInfo status detail
+    (it talks gRPC, so there is no Retry-After header). ElevenLabs' ApiError carries no response headers,
+    so its errors always fall back to backoff.
+    """
+    if not isinstance(exc, google_exceptions.GoogleAPICallError):
+        return None
+    for detail in exc.details:
+        if isinstance(detail, error_details_pb2.RetryInfo) and detail.HasField("retry_delay"):
+            return detail.retry_delay.ToTimedelta().total_seconds()
+    return None
+
+
+_provider_backoff = wait_exponential_jitter(initial=1, max=PROVIDER_RETRY_MAX_WAIT_SECONDS)
+
+def _wait_for_retry(retry_state) -> float:
+    # Honour Gemini's suggested retry delay when given, otherwise exponential backoff with jitter
+    retry_after = _retry_after_seconds(retry_state.outcome.exception())
+    if retry_after is not None:
+        return min(retry_after, PROVIDER_RETRY_MAX_WAIT_SECONDS)
+    return _provider_backoff(retry_state)
+
+
+def _log_retry(retry_state):
+    logger.warning(
+        "Provider call failed (attempt %d/%d), retrying: %s",
+        retry_state.attempt_number, PROVIDER_RETRY_ATTEMPTS, retry_state.outcome.exception()
+    )
+
+
+# Retry decorator for async provider calls; the waits are asyncio sleeps, so the event loop keeps running.
+# The last error is re-raised unchanged so the endpoints' error mapping still applies.
+provider_retry = retry(
+    retry=retry_if_exception(_is_retryable_provider_error),
+    stop=stop_after_attempt(PROVIDER_RETRY_ATTEMPTS),
+    wait=_wait_for_retry,
+    before_sleep=_log_retry,
+    reraise=True
+)
+
+
+class ClientPool:
+    """
+    Round-robins outbound calls over `size` SDK clients, each built by `factory`
+    around its own httpx.AsyncClient (and therefore its own connection pool).
+    Callers hold `semaphore` around each call to cap concurrent requests to the provider.
+    """
+
+    def __init__(self, factory, size: int, max_inflight: int):
+        self._http_clients = [
+            httpx.AsyncClient(
+                limits=OUTBOUND_HTTP_LIMITS,
+                http2=True,
+                timeout=OUTBOUND_HTTP_TIMEOUT_SECONDS,
+                follow_redirects=True
+            )
+            for _ in range(size)
+        ]
+        self.clients = [factory(http_client) for http_client in self._http_clients]
+        self._index = itertools.count()
+        self.semaphore = asyncio.Semaphore(max_inflight)
+
+    def next(self):
+        return self.clients[next(self._index) % len(self.clients)]
+
+    async def aclose(self):
+        await asyncio.gather(*(http_client.aclose() for http_client in self._http_clients))
+
+
+class GeminiClient:
+    """
+    Sends prompts to `model`. Every call to Gemini (single or streamed) holds `semaphore`,
+    capping in-flight requests.
+    """
+
+    def __init__(self, model: genai.GenerativeModel, max_inflight: int):
+        self.model = model
+        self.semaphore = asyncio.Semaphore(max_inflight)
+
+    async def submit(self, prompt: str, generation_config: genai.types.GenerationConfig):
+        """Sends a prompt and waits for its Gemini response."""
+        logger.debug("Internal: Sending prompt to Google Gemini.")
+        return await self._generate(prompt, generation_config)
+
+    async def stream(self, prompt: str, generation_config: genai.types.GenerationConfig):
+        """Streams response chunks for a single prompt."""
+        # Gemini is drained into a queue by its own task, so the semaphore slot is only held while
+        # Gemini is generating, not while a slow client (e.g. an SSE reader) consumes the chunks
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        async def _drain_stream():
+            try:
+                response = await self._open_stream(prompt, generation_config) # Returns holding a slot
+                try:
+                    async for chunk in response:
+                        chunks.put_nowait(chunk)
+                finally:
+                    self.semaphore.release()
+            finally:
+                chunks.put_nowait(None) # End-of-stream marker; the consumer awaits the task to surface errors
+
+        producer = asyncio.create_task(_drain_stream())
+        try:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+            await producer
+        finally:
+            producer.cancel()
+
+    @provider_retry
+    async def _generate(self, prompt: str, generation_config: genai.types.GenerationConfig):
+        async with self.semaphore:
+            return await self.model.generate_content_async(
+                prompt,
+                generation_config=generation_config,
+                request_options=GEMINI_REQUEST_OPTIONS
+            )
+
+    @provider_retry
+    async def _open_stream(self, prompt: str, generation_config: genai.types.GenerationConfig):
+        # Only opening the stream (which waits for the first chunk) is retried; once chunks
+        # have been forwarded to the client a failure can't be replayed transparently.
+        # The slot is taken per attempt, so it isn't held through the backoff between attempts;
+        # on success it stays held and the caller releases it once the stream is drained.
+        await self.semaphore.acquire()
+        try:
+            return await self.model.generate_content_async(
+                prompt,
+                generation_config=generation_config,
+                stream=True,
+                request_options=GEMINI_REQUEST_OPTIONS
+            )
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+
+class ScriptCache:
+    """
+    LRU cache of generated scripts keyed by topic. Exact repeats (ignoring case and whitespace) are
+    matched by hash; paraphrased topics are matched by cosine similarity of their Gemini embeddings.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, similarity_threshold: float,
+                 embedding_model: str, embedding_timeout_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embedding_model = embedding_model
+        self.embedding_timeout_seconds = embedding_timeout_seconds
+        # key -> (stored_at, unit-length topic embedding or None, (raw_script_text, segments)); oldest use first
+        self._entries: collections.OrderedDict[str, tuple[float, list[float] | None, tuple[str, list[dict[str, str]]]]] = collections.OrderedDict()
+
+    async def lookup(self, topic: str) -> tuple[tuple[str, list[dict[str, str]]] | None, asyncio.Task | None]:
+        """
+        Returns `(cached (raw_script_text, segments) or None, task computing the topic embedding)`; on a miss,
+        pass the task to `store`. The embedding is only waited for when there are cached embeddings to compare
+        it with, so on a cold cache it is computed while the script is being generated.
+        """
+        self._evict_expired()
+        key = self._key(topic)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            logger.info("Internal: Script cache hit (exact) for topic: %s", topic)
+            return entry[2], None
+
+        embedding_task = asyncio.create_task(self._embed(topic))
+        candidates = [(entry_key, entry_embedding) for entry_key, (_, entry_embedding, _) in self._entries.items()
+                      if entry_embedding is not None]
+        if not candidates:
+            return None, embedding_task
+        embedding = await embedding_task
+        if embedding is None:
+            return None, embedding_task
+
+        # A few hundred 768-dimension dot products take milliseconds in pure Python, so keep them off the event loop
+        best_key, best_similarity = await asyncio.to_thread(
+            self._most_similar, embedding, candidates, self.similarity_threshold
+        )
+        if best_key is None or best_key not in self._entries: # No match, or evicted while we compared
+            return None, embedding_task
+
+        self._entries.move_to_end(best_key)
+        logger.info("Internal: Script cache hit (similarity %.3f) for topic: %s", best_similarity, topic)
+        return self._entries[best_key][2], embedding_task
+
+    async def store(self, topic: str, embedding_task: asyncio.Task | None, result: tuple[str, list[dict[str, str]]]):
+        embedding = await embedding_task if embedding_task is not None else None
+        key = self._key(topic)
+        self._entries[key] = (time.monotonic(), embedding, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _most_similar(embedding: list[float], candidates: list[tuple[str, list[float]]],
+                      threshold: float) -> tuple[str | None, float]:
+        best_key, best_similarity = None, threshold
+        for entry_key, entry_embedding in candidates:
+            similarity = sum(map(operator.mul, embedding, entry_embedding)) # Both are unit length
+            if similarity >= best_similarity:
+                best_key, best_similarity = entry_key, similarity
+        return best_key, best_similarity
+
+    @staticmethod
+    def _key(topic: str) -> str:
+        return hashlib.sha256(" ".join(topic.lower().split()).encode()).hexdigest()
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        # Entries are kept in LRU order rather than insertion order, so check them all
+        for key in [key for key, (stored_at, _, _) in self._entries.items() if stored_at < cutoff]:
+            del self._entries[key]
+
+    async def _embed(self, topic: str) -> list[float] | None:
+        # Not retried and kept short: the embedding only enables fuzzy matches, so on failure
+        # fall back to exact ones rather than hold up script generation
+        try:
+            result = await genai.embed_content_async(
+                model=self.embedding_model,
+                content=topic,
+                task_type="semantic_similarity",
+                request_options={"retry": None, "timeout": self.embedding_timeout_seconds}
+            )
+        except Exception as e:
+            logger.warning("Internal: Topic embedding failed, script cache will only match exact topics: %s", e)
+            return None
+        embedding = result["embedding"]
+        norm = math.hypot(*embedding)
+        return [value / norm for value in embedding] if norm else None
+
+
+class ScriptSegmenter:
+    """
+    Splits a script into segments while it is still being streamed. `feed` returns the segments that
+    each new piece of text completes; a segment is complete once the next speaker label has started.
+    Only the unfinished segment is kept as working text, so each chunk is scanned and parsed once.
+    """
+
+    def __init__(self):
+        self.segments: list[dict[str, str]] = []
+        self._text_parts: list[str] = []
+        self._tail = "" # Text from the last speaker label (or the start, before any label) not yet parsed
+        self._tail_has_label = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text_parts)
+
+    def feed(self, delta: str) -> list[dict[str, str]]:
+        # A label can straddle chunks, so rescan from the start of the tail's last line, but not the
+        # label the tail itself starts with
+        search_from = self._tail.rfind("\n") + 1
+        if self._tail_has_label:
+            search_from = max(search_from, 1)
+        self._text_parts.append(delta)
+        self._tail += delta
+
+        last_label = None
+        for last_label in _SPEAKER_LABEL_RE.finditer(self._tail, search_from):
+            pass
+        if last_label is None:
+            return []
+        # Everything before the newest label is finished (text before the very first label is dropped)
+        completed = _parse_script_into_segments(self._tail[:last_label.start()])
+        self._tail = self._tail[last_label.start():]
+        self._tail_has_label = True
+        self.segments.extend(completed)
+        return completed
+
+    def finish(self) -> list[dict[str, str]]:
+        """Returns the final segment(s) once the stream has ended."""
+        completed = _parse_script_into_segments(self._tail)
+        self._tail = ""
+        self.segments.extend(completed)
+        return completed
+
+
+class GZipExceptPathsMiddleware:
+    """GZipMiddleware that skips compression for requests to `excluded_paths`."""
+
+    def __init__(self, app: ASGIApp, excluded_paths: set[str], minimum_size: int = 500):
+        self.app = app
+        self.gzip_app = GZipMiddleware(app, minimum_size=minimum_size)
+        self.excluded_paths = frozenset(excluded_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip_app(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Loads API keys and builds the Gemini / ElevenLabs clients once per worker at startup,
+    and releases them on shutdown. Endpoints get them from `app.state` via the dependencies below.
+    """
+    _log_listener.start()
+
+    # load env variables
+    load_dotenv()
+
+    # e.g. LOG_LEVEL=DEBUG to see per-segment details; debug calls cost almost nothing while it's INFO
+    log_level = os.getenv("LOG_LEVEL", "INFO").upper()
     try:
-        elevenlabs_client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-        print("ElevenLabs client initialized.")
-    except Exception as e:
-        print(f"Error initializing ElevenLabs client: {e}")
-else:
-    print("CRITICAL: ELEVENLABS_API_KEY not found. Audio generation will fail.")
+        logger.setLevel(log_level)
+    except ValueError:
+        logger.warning("Unknown LOG_LEVEL '%s', keeping INFO.", log_level)
 
-    
-app = FastAPI()
+    # On-disk TTS cache, only used if the directory is private to this user
+    global _tts_cache_dir
+    _tts_cache_dir = _prepare_tts_cache_dir(os.getenv("TTS_CACHE_DIR", TTS_CACHE_DIR_DEFAULT))
 
-from fastapi.middleware.cors import CORSMiddleware
+    # get api key
+    google_gemini_api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
+    elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
+    # DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 
-app = FastAPI()
+    # config Google Gemini and create the model
+    app.state.gemini_model = None
+    app.state.gemini_client = None
+    if google_gemini_api_key:
+        genai.configure(api_key=google_gemini_api_key)
+        app.state.gemini_model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", GEMINI_MODEL_NAME_DEFAULT))
+        app.state.gemini_client = GeminiClient(
+            app.state.gemini_model,
+            max_inflight=int(os.getenv("GEMINI_MAX_INFLIGHT", GEMINI_MAX_INFLIGHT_DEFAULT))
+        )
+    else:
+        logger.critical("GOOGLE_GEMINI_API_KEY not found. Script generation will fail.")
+
+    # Configure ElevenLabs Clients (async, so TTS calls don't block the event loop).
+    # Each client in the pool has its own long-lived httpx client, so requests reuse pooled
+    # TCP/TLS connections and are spread over several HTTP/2 connections.
+    # (Gemini goes over gRPC, whose channel is already created once and multiplexed by the SDK.)
+    app.state.elevenlabs_pool = None
+    if elevenlabs_api_key:
+        try:
+            app.state.elevenlabs_pool = ClientPool(
+                lambda http_client: AsyncElevenLabs(api_key=elevenlabs_api_key, httpx_client=http_client),
+                size=ELEVENLABS_CLIENT_POOL_SIZE,
+                max_inflight=int(os.getenv("ELEVENLABS_MAX_INFLIGHT", ELEVENLABS_MAX_INFLIGHT_DEFAULT))
+            )
+            logger.info("ElevenLabs client initialized.")
+        except Exception as e:
+            logger.exception("Error initializing ElevenLabs client: %s", e)
+    else:
+        logger.critical("ELEVENLABS_API_KEY not found. Audio generation will fail.")
+
+    yield
+
+    if app.state.elevenlabs_pool:
+        await app.state.elevenlabs_pool.aclose()
+    _log_listener.stop()
+
+
+# orjson serializes every JSON response faster than the stdlib json encoder
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 origins = [
     "http://localhost:5173", # Your Vite dev server default port
@@ -69,9 +574,26 @@ app.add_middleware(
     expose_headers=["X-Podcast-Script", "Content-Disposition"]
 )
 
+# Compress JSON responses (e.g. generated scripts) for clients that accept gzip.
+# MP3 audio is already compressed, so the audio endpoints are passed through untouched.
+app.add_middleware(
+    GZipExceptPathsMiddleware,
+    excluded_paths=GZIP_EXCLUDED_PATHS,
+    minimum_size=500
+)
+
 # Pydantic model for request body
 class ScriptRequest(BaseModel):
-    topic: str
+    topic: str = Field(..., min_length=1, max_length=500) # Same limit as MAX_TOPIC_LENGTH in frontend/src/App.jsx
+
+    @field_validator("topic")
+    @classmethod
+    def topic_not_blank(cls, topic: str) -> str:
+        # Strip once here so the rest of the request handling gets a clean topic
+        topic = topic.strip()
+        if not topic:
+            raise ValueError("Topic cannot be empty.")
+        return topic
     
 class Segment(BaseModel):
     speaker: str
@@ -105,6 +627,31 @@ class VoicesListResponse(BaseModel):
 class PodcastAudioRequest(BaseModel):
     segments: list[Segment]
 
+# In-process cache for /api/list-voices: (fetched_at, payload shaped like VoicesListResponse)
+_voices_cache: tuple[float, dict[str, list[dict[str, str | None]]]] | None = None
+_voices_lock = asyncio.Lock()
+
+_script_cache = ScriptCache(
+    ttl_seconds=SCRIPT_CACHE_TTL_SECONDS,
+    max_entries=SCRIPT_CACHE_MAX_ENTRIES,
+    similarity_threshold=SCRIPT_CACHE_SIMILARITY_THRESHOLD,
+    embedding_model=SCRIPT_EMBEDDING_MODEL,
+    embedding_timeout_seconds=SCRIPT_EMBEDDING_TIMEOUT_SECONDS
+)
+
+# --- Dependencies ---
+def get_gemini_client(request: Request) -> GeminiClient:
+    gemini_client = request.app.state.gemini_client
+    if gemini_client is None:
+        raise HTTPException(status_code=500, detail="Gemini model not configured.")
+    return gemini_client
+
+def get_elevenlabs_pool(request: Request) -> ClientPool:
+    elevenlabs_pool = request.app.state.elevenlabs_pool
+    if elevenlabs_pool is None:
+        raise HTTPException(status_code=500, detail="ElevenLabs client not configured.")
+    return elevenlabs_pool
+
 # --- End Points ---
 @app.get("/")
 async def root():
@@ -116,289 +663,774 @@ async def health_check():
 
 
 @app.post("/api/generate-script", response_model=StructuredScriptResponse)
-async def generate_script_endpoint(request: ScriptRequest):
+async def generate_script_endpoint(request: ScriptRequest, gemini_client: GeminiClient = Depends(get_gemini_client)):
     """
     Generates a podcast script based on the provided topic,
     parses it into speaker segments, and returns both.
     """
-    print(f"API: Received topic for script generation: {request.topic}")
-
-    if not request.topic or request.topic.strip() == "":
-        raise HTTPException(status_code=400, detail="Topic cannot be empty.")
+    logger.debug("API: Received topic for script generation: %s", request.topic)
 
     try:
         # Call the refactored logic which now returns raw text and segments
-        raw_script, parsed_segments = await _generate_script_logic(request.topic)
+        raw_script, parsed_segments = await _generate_script_logic(gemini_client, request.topic)
 
         if not parsed_segments:
-            print("API Warning: Script generation resulted in no usable segments.")
+            logger.warning("API: Script generation resulted in no usable segments.")
 
         return StructuredScriptResponse(
             raw_script_text=raw_script,
             segments=parsed_segments
         )
 
-    except ValueError as ve: # Catch input validation errors from _generate_script_logic
-        raise HTTPException(status_code=400, detail=str(ve))
     except RuntimeError as re: # Catch internal processing errors from _generate_script_logic
-        print(f"API: Runtime error during script generation: {re}")
+        logger.error("API: Runtime error during script generation: %s", re)
         if "Gemini" in str(re): # Be more specific about upstream errors
             raise HTTPException(status_code=502, detail=f"Error with script generation service: {str(re)}")
         else:
             raise HTTPException(status_code=500, detail=f"Internal server error during script generation: {str(re)}")
     except Exception as e: # Generic catch-all
-        print(f"API: Unexpected error in /generate-script: {e}")
+        logger.exception("API: Unexpected error in /generate-script: %s", e)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 
+@app.post("/api/generate-script-stream")
+async def generate_script_stream_endpoint(request: ScriptRequest, gemini_client: GeminiClient = Depends(get_gemini_client)):
+    """
+    Streams the podcast script as Server-Sent Events while Gemini generates it.
+    Each text event is `data: {"delta": "<text>"}`, and an `event: segment` with
+    `{"speaker", "text"}` follows as soon as a speaker's segment is complete. The stream
+    ends with an `event: done` (or `event: error` with a `detail`) message.
+    """
+    logger.debug("API: Received topic for streaming script generation: %s", request.topic)
+
+    async def event_stream():
+        try:
+            # Shares the script cache with the other script endpoints; a cached script arrives as one delta
+            async for kind, value in _stream_script(gemini_client, request.topic):
+                if kind == "delta":
+                    yield f"data: {json.dumps({'delta': value})}\n\n"
+                else:
+                    yield f"event: segment\ndata: {json.dumps(value)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            logger.exception("API: Error while streaming script from Gemini: %s", e)
+            yield f"event: error\ndata: {json.dumps({'detail': f'Error with script generation service: {str(e)}'})}\n\n"
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no" # Stop reverse proxies (nginx) from buffering the stream
+    }
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+
+@app.get("/api/list-voices", responses={200: {"model": VoicesListResponse}})
+async def list_voices_endpoint(elevenlabs_pool: ClientPool = Depends(get_elevenlabs_pool)):
+    """
+    Lists the available ElevenLabs voices.
+    The catalog is cached in-process for VOICES_CACHE_TTL_SECONDS and returned as a plain
+    dict through ORJSONResponse, skipping per-request Pydantic validation.
+    """
+    global _voices_cache
+
+    if _voices_cache and time.monotonic() - _voices_cache[0] < VOICES_CACHE_TTL_SECONDS:
+        return ORJSONResponse(_voices_cache[1])
+
+    async with _voices_lock:
+        # Another request may have refreshed the cache while we waited for the lock
+        if _voices_cache and time.monotonic() - _voices_cache[0] < VOICES_CACHE_TTL_SECONDS:
+            return ORJSONResponse(_voices_cache[1])
+
+        try:
+            eleven_voices = await _fetch_voices(elevenlabs_pool)
+        except Exception as e:
+            logger.exception("API: Error fetching voices from ElevenLabs: %s", e)
+            raise HTTPException(status_code=502, detail=f"Failed to fetch voices from ElevenLabs: {str(e)}")
+
+        payload = {"voices": [
+            {"voice_id": voice.voice_id, "name": voice.name or "", "category": voice.category}
+            for voice in eleven_voices.voices
+        ]}
+        _voices_cache = (time.monotonic(), payload)
+        logger.info("API: Cached %d ElevenLabs voices.", len(payload["voices"]))
+        return ORJSONResponse(payload)
+
+
 @app.post("/api/generate-podcast-audio")
-async def generate_podcast_audio_endpoint(request: PodcastAudioRequest):
+async def generate_podcast_audio_endpoint(request: PodcastAudioRequest, elevenlabs_pool: ClientPool = Depends(get_elevenlabs_pool)):
     """
     Generates a single podcast audio file from structured script segments,
     using different voices for Host and Guest.
     """
-    print(f"API: Received request to generate podcast audio for {len(request.segments)} segments.")
+    logger.info("API: Received request to generate podcast audio for %d segments.", len(request.segments))
 
     if not request.segments:
         raise HTTPException(status_code=400, detail="No script segments provided.")
-    if not elevenlabs_client:
-        raise HTTPException(status_code=500, detail="ElevenLabs client not configured.")
 
-    try:
-        combined_audio = AudioSegment.empty() # Initialize an empty AudioSegment
-        
-        eleven_voice_settings = VoiceSettings(
-            stability=0.71,
-            similarity_boost=0.5, # Adjust for desired similarity to base voice
-            style=0.0, # Set to > 0 if using a voice with style exaggeration
-            use_speaker_boost=True
+    tts_jobs = []
+    for i, segment_data in enumerate(request.segments):
+        segment_count = i + 1
+        if not segment_data.text.strip():
+            logger.debug("Segment %d for %s is empty, skipping audio generation for it.", segment_count, segment_data.speaker)
+            continue
+        tts_jobs.append((segment_count, segment_data.speaker, _voice_for_speaker(segment_data.speaker, segment_count), segment_data.text))
+
+    # The finished MP3 of every podcast that streamed completely is kept in the TTS cache, so an exact
+    # repeat skips synthesis and is served from disk (with Content-Length and range requests for seeking)
+    podcast_cache_key = _podcast_cache_key(tts_jobs)
+    cached_podcast = await asyncio.to_thread(_tts_cache_pin, podcast_cache_key)
+    if cached_podcast is not None:
+        logger.info("API: Serving cached podcast audio for %d segments.", len(tts_jobs))
+        pinned_path, pinned_stat = cached_podcast
+        return FileResponse(
+            pinned_path,
+            stat_result=pinned_stat,
+            media_type="audio/mpeg",
+            headers=PODCAST_AUDIO_HEADERS,
+            background=BackgroundTask(_remove_quietly, pinned_path)
         )
-        # Default model for ElevenLabs TTS
-        eleven_model_id = "eleven_multilingual_v2" # Or your preferred model
 
-        segment_count = 0
-        for i, segment_data in enumerate(request.segments):
-            segment_count = i + 1
-            speaker = segment_data.speaker
-            text_to_speak = segment_data.text
+    async def _segment_tts_jobs():
+        for job in tts_jobs:
+            yield job
 
-            if not text_to_speak.strip():
-                print(f"Segment {segment_count} for {speaker} is empty, skipping audio generation for it.")
-                continue
+    # Only lines that actually repeat need their audio kept around for reuse
+    line_counts = collections.Counter((voice_id, text.strip()) for _, _, voice_id, text in tts_jobs)
+    repeated_lines = {line_key for line_key, count in line_counts.items() if count > 1}
+
+    silent_segments: list[int] = []
+
+    async def _cache_podcast_audio(podcast_chunks):
+        podcast_audio = bytearray()
+        try:
+            async for chunk in podcast_chunks:
+                podcast_audio += chunk
+                yield chunk
+        finally:
+            await podcast_chunks.aclose()
+        # Only reached once every segment streamed, so truncated podcasts are never cached; neither
+        # are ones missing a segment ElevenLabs returned no audio for, so a repeat retries that segment
+        if podcast_audio and not silent_segments:
+            await asyncio.to_thread(_tts_cache_put, podcast_cache_key, podcast_audio)
+
+    try:
+        podcast_chunks = _cache_podcast_audio(_podcast_audio_chunks(
+            elevenlabs_pool, _segment_tts_jobs(), repeated_lines, silent_segments
+        ))
+        return await _podcast_audio_response(podcast_chunks)
+    except HTTPException: # Re-raise HTTPExceptions directly
+        raise
+    except Exception as e:
+        raise _podcast_audio_error(e, "/generate-podcast-audio")
+
+
+@app.post("/api/generate-podcast")
+async def generate_podcast_endpoint(request: ScriptRequest,
+                                    gemini_client: GeminiClient = Depends(get_gemini_client),
+                                    elevenlabs_pool: ClientPool = Depends(get_elevenlabs_pool)):
+    """
+    Generates the script and the podcast audio in one request. Each segment is sent to ElevenLabs
+    as soon as Gemini has finished writing it, so speech synthesis overlaps script generation, and
+    the MP3 is streamed back as in /api/generate-podcast-audio.
+    """
+    logger.debug("API: Received topic for podcast generation: %s", request.topic)
+
+    async def _script_tts_jobs():
+        # Gemini is drained by its own producer task into a queue, so the script is generated at Gemini's
+        # speed (releasing its Gemini slot early) while the TTS window only throttles synthesis.
+        script_jobs: asyncio.Queue = asyncio.Queue()
+
+        async def _produce_script_jobs():
+            try:
+                segment_count = 0
+                async for segment in _stream_script_segments(gemini_client, request.topic):
+                    segment_count += 1
+                    script_jobs.put_nowait((segment_count, segment["speaker"],
+                                            _voice_for_speaker(segment["speaker"], segment_count), segment["text"]))
+            finally:
+                script_jobs.put_nowait(None) # End-of-script marker; the consumer awaits the task to surface errors
+
+        producer = asyncio.create_task(_produce_script_jobs())
+        try:
+            while (job := await script_jobs.get()) is not None:
+                yield job
+            await producer # Re-raises a script generation failure
+        except Exception as e:
+            raise RuntimeError(f"Internal Gemini Error: {str(e)}") from e
+        finally:
+            producer.cancel()
+
+    try:
+        return await _podcast_audio_response(_podcast_audio_chunks(elevenlabs_pool, _script_tts_jobs()))
+    except HTTPException:
+        raise
+    except RuntimeError as re:
+        if "Gemini" in str(re): # Script generation failed before any audio was sent
+            logger.error("API: Runtime error during script generation: %s", re)
+            raise HTTPException(status_code=502, detail=f"Error with script generation service: {str(re)}")
+        raise _podcast_audio_error(re, "/generate-podcast")
+    except Exception as e:
+        raise _podcast_audio_error(e, "/generate-podcast")
+
+
+def _voice_for_speaker(speaker: str, segment_count: int) -> str:
+    voice_id = SPEAKER_VOICE_IDS.get(speaker.lower())
+    if voice_id is None:
+        logger.warning("Unknown speaker '%s' in segment %d. Using default host voice.", speaker, segment_count)
+        return HOST_VOICE_ID # Fallback or could raise error
+    return voice_id
+
+
+def _podcast_audio_error(e: Exception, endpoint: str) -> HTTPException:
+    """Maps an ElevenLabs failure to the HTTPException the audio endpoints raise. Call from an except block."""
+    logger.exception("API: Unexpected error in %s: %s", endpoint, e)
+    # Check for specific ElevenLabs errors if possible, e.g., quota
+    error_message = str(e)
+    error_message_lower = error_message.lower() # Lowercase once rather than per keyword check
+    if "quota" in error_message_lower or "limit" in error_message_lower or "exceeded" in error_message_lower:
+        return HTTPException(status_code=429, detail=f"ElevenLabs API Error (Quota/Limit): {error_message}")
+    if "Unauthenticated" in error_message or "Authentication" in error_message:
+        return HTTPException(status_code=401, detail=f"ElevenLabs Authentication Error: {error_message}")
+    return HTTPException(status_code=500, detail=f"Failed to generate podcast audio: {error_message}")
+
+
+async def _podcast_audio_chunks(elevenlabs_pool: ClientPool, tts_jobs,
+                                repeated_lines: set[tuple[str, str]] | None = None,
+                                silent_segments: list[int] | None = None):
+    """
+    Synthesizes `(segment_count, speaker, voice_id, text)` jobs from the async generator `tts_jobs`
+    as they arrive and yields the podcast's MP3 bytes in script order. When the script is known up
+    front, `repeated_lines` holds the `(voice_id, text.strip())` lines that occur more than once, and
+    only their audio is kept for reuse; None (script still being generated) keeps every line's audio.
+    The numbers of segments ElevenLabs returned no audio for are appended to `silent_segments`.
+    """
+    # TTS is network-bound, so segments are synthesized ahead of the one being streamed: up to
+    # TTS_CONCURRENT_REQUESTS segments are in flight, and the next one starts as soon as the segment
+    # at the head is fully synthesized. This hides the per-segment round-trip without starting a whole
+    # long script at once (so a client that disconnects early doesn't burn TTS credits); the pool's own
+    # semaphore still caps the process.
+    window = asyncio.Semaphore(TTS_CONCURRENT_REQUESTS)
+    scheduled: asyncio.Queue = asyncio.Queue()
+    synth_tasks: list[asyncio.Task] = []
+    # (voice_id, text) -> task that first synthesized it, so repeated lines ("Thanks, Alex.") are only generated
+    # once per podcast. Those tasks keep their chunks until the podcast is done, about 1 MB per spoken minute,
+    # so only lines that may repeat are registered here.
+    synth_by_line: dict[tuple[str, str], asyncio.Task] = {}
 
-            print(f"Processing segment {segment_count}/{len(request.segments)}: Speaker: {speaker}")
+    async def _synth(segment_count: int, speaker: str, voice_id: str, text: str, chunk_queue: asyncio.Queue,
+                     keep_audio: bool) -> list[bytes]:
+        logger.debug("Processing segment %d: Speaker: %s", segment_count, speaker)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("  Generating audio for '%s...' with voice %s", text[:50], voice_id)
+        audio_chunks = []
+        try:
+            async for chunk in _stream_segment(elevenlabs_pool, voice_id, text):
+                if keep_audio:
+                    audio_chunks.append(chunk)
+                chunk_queue.put_nowait(chunk)
+        finally:
+            chunk_queue.put_nowait(None) # End-of-segment marker; the consumer awaits the task to surface errors
+        return audio_chunks
 
-            if speaker.lower() == "host":
-                voice_id_to_use = HOST_VOICE_ID
-            elif speaker.lower() == "guest":
-                voice_id_to_use = GUEST_VOICE_ID
+    async def _replay(original: asyncio.Task, chunk_queue: asyncio.Queue) -> list[bytes]:
+        try:
+            # Shielded so tearing down this replay doesn't cancel the segment it repeats
+            audio_chunks = await asyncio.shield(original)
+            for chunk in audio_chunks:
+                chunk_queue.put_nowait(chunk)
+        finally:
+            chunk_queue.put_nowait(None)
+        return audio_chunks
+
+    async def _schedule_segments():
+        try:
+            async for job in tts_jobs:
+                await window.acquire() # Back-pressure: wait for a free slot before starting the next segment
+                chunk_queue = asyncio.Queue()
+                segment_count, _, voice_id, text = job
+                line_key = (voice_id, text.strip())
+                original = synth_by_line.get(line_key)
+                if original is None:
+                    keep_audio = repeated_lines is None or line_key in repeated_lines
+                    task = asyncio.create_task(_synth(*job, chunk_queue, keep_audio))
+                    if keep_audio:
+                        synth_by_line[line_key] = task
+                else:
+                    logger.debug("  Segment %d repeats an earlier line; reusing its audio.", segment_count)
+                    task = asyncio.create_task(_replay(original, chunk_queue))
+                synth_tasks.append(task)
+                scheduled.put_nowait((job, chunk_queue, task))
+        finally:
+            scheduled.put_nowait(None)
+            await tts_jobs.aclose() # Stops the job source (e.g. the Gemini producer) when we're torn down early
+
+    scheduler = asyncio.create_task(_schedule_segments())
+    try:
+        # Drains segments in script order, so the stream plays back in order even though they finish out of
+        # order. The segment at the head is forwarded chunk by chunk as ElevenLabs streams it; the ones
+        # behind it buffer in their queues until their turn.
+        while (entry := await scheduled.get()) is not None:
+            (segment_count, speaker, _, _), chunk_queue, task = entry
+            segment_size = 0
+            head = bytearray() # Held back until the segment's tag/header frame can be stripped
+            audio_start = None
+            while (chunk := await chunk_queue.get()) is not None:
+                if not chunk:
+                    continue
+                segment_size += len(chunk)
+                if audio_start is None:
+                    head += chunk
+                    audio_start = _mp3_audio_start(head)
+                    if audio_start is None:
+                        continue
+                    chunk = bytes(memoryview(head)[audio_start:]) # One copy, not slice-then-convert
+                if chunk:
+                    yield chunk
+            if audio_start is None and head:
+                yield bytes(head) # Segment ended before its header could be parsed; send it as is
+            await task # Re-raises a synthesis failure
+            window.release() # Let the next segment start now that this one is fully synthesized
+            if segment_size:
+                logger.debug("  Segment %d audio (%d bytes) streamed.", segment_count, segment_size)
             else:
-                print(f"Warning: Unknown speaker '{speaker}' in segment {segment_count}. Using default host voice.")
-                voice_id_to_use = HOST_VOICE_ID # Fallback or could raise error
+                logger.warning("No audio data received from ElevenLabs for segment %d (%s).", segment_count, speaker)
+                if silent_segments is not None:
+                    silent_segments.append(segment_count)
+        await scheduler # Re-raises a failure in the job source (e.g. script generation)
+    finally:
+        # Client disconnects or failures cancel whatever is still outstanding
+        scheduler.cancel()
+        for task in synth_tasks:
+            task.cancel()
+
+
+async def _podcast_audio_response(podcast_chunks) -> StreamingResponse:
+    """
+    Waits for the first audio bytes from `podcast_chunks` before committing to a 200, so a failing
+    or empty synthesis still surfaces as an exception the endpoint can map to an error status,
+    then streams the rest.
+    """
+    first_chunk = await anext(podcast_chunks, None)
+    if first_chunk is None:
+        logger.error("API: No audio was combined. All segments might have failed or were empty.")
+        raise HTTPException(status_code=500, detail="Failed to generate any audio content from the provided segments.")
+
+    async def _stream_podcast_audio():
+        # ElevenLabs returns every segment in the same MP3 format and MP3 frames are self-delimiting,
+        # so the segments' frames are sent back to back as they arrive, with no decode/re-encode pass.
+        try:
+            yield first_chunk
+            async for chunk in podcast_chunks:
+                yield chunk
+            logger.info("API: Finished streaming podcast audio segments.")
+        except Exception as stream_err:
+            # Headers are already sent; log and abort so the client sees a truncated transfer
+            logger.exception("API: Error while streaming podcast audio: %s", stream_err)
+            raise
+        finally:
+            await podcast_chunks.aclose()
+
+    logger.info("API: First podcast audio bytes ready. Streaming MP3.")
+    return StreamingResponse(_stream_podcast_audio(), media_type="audio/mpeg", headers=PODCAST_AUDIO_HEADERS)
+
+
+@provider_retry
+async def _fetch_voices(elevenlabs_pool: ClientPool):
+    async with elevenlabs_pool.semaphore:
+        return await elevenlabs_pool.next().voices.get_all()
+
+
+# Layer III bitrates (kbps) by MPEG version bits (3 = MPEG-1, otherwise MPEG-2/2.5) and sample rates by version bits
+_MP3_BITRATES_KBPS = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_audio_start(head: bytes) -> int | None:
+    """
+    Returns the offset of the first audio frame in an MP3 segment, skipping a leading ID3v2 tag and
+    Xing/Info header frame, or None if `head` is too short to tell yet.
+
+    Those headers describe a single segment (the Xing/Info frame carries its frame count and duration),
+    so they would be wrong, or show up as stray frames, once segments are concatenated.
+    """
+    offset = 0
+    if head[:3] == b"ID3":
+        if len(head) < 10:
+            return None
+        # Tag size is a 28-bit "syncsafe" integer (7 bits per byte), excluding the 10-byte header and optional footer
+        offset = 10 + ((head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | (head[9] & 0x7F))
+        if head[5] & 0x10:
+            offset += 10
+    if len(head) < offset + 4:
+        return None
+
+    b1, b2, b3 = head[offset + 1], head[offset + 2], head[offset + 3]
+    version = (b1 >> 3) & 0x3
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x3
+    if (head[offset] != 0xFF or (b1 & 0xE0) != 0xE0 or version == 1 or (b1 >> 1) & 0x3 != 1
+            or bitrate_index in (0, 15) or sample_rate_index == 3):
+        return offset # Not a Layer III frame header we understand; leave the data untouched
+
+    mono = (b3 >> 6) == 0x3
+    if version == 3:
+        side_info_size = 17 if mono else 32
+        bitrate = _MP3_BITRATES_KBPS[3][bitrate_index] * 1000
+        frame_length_factor = 144 # 1152 samples per frame / 8 bits
+    else:
+        side_info_size = 9 if mono else 17
+        bitrate = _MP3_BITRATES_KBPS[2][bitrate_index] * 1000
+        frame_length_factor = 72 # 576 samples per frame / 8 bits
+    tag_offset = offset + 4 + side_info_size
+    if len(head) < tag_offset + 4:
+        return None
+    if head[tag_offset:tag_offset + 4] not in (b"Xing", b"Info"):
+        return offset
+
+    frame_length = frame_length_factor * bitrate // _MP3_SAMPLE_RATES[version][sample_rate_index] + ((b2 >> 1) & 0x1)
+    if len(head) < offset + frame_length:
+        return None
+    return offset + frame_length
+
+
+async def _stream_segment(elevenlabs_pool: ClientPool, voice_id: str, text: str):
+    """Streams one segment's MP3 bytes, from the TTS cache or from ElevenLabs as they are generated."""
+    cache_key = _tts_cache_key(voice_id, text)
+    # Cache reads/writes (and the occasional eviction scan) are blocking disk I/O, so keep them off the event loop
+    cached_audio = await asyncio.to_thread(_tts_cache_get, cache_key)
+    if cached_audio is not None:
+        logger.debug("  TTS cache hit for segment with voice %s.", voice_id)
+        yield cached_audio
+        return
+
+    segment_audio = bytearray() # Copy for the cache, grown in place rather than joined from a list at the end
+    # The provider semaphore is held for the whole request, including draining the stream (the
+    # consumer only queues the chunks, so this doesn't wait on the client), but not between retries
+    first_chunk, audio_stream = await _open_segment_stream(elevenlabs_pool, voice_id, text) # Returns holding a slot
+    try:
+        segment_audio += first_chunk
+        yield first_chunk
+        async for chunk in audio_stream:
+            segment_audio += chunk
+            yield chunk
+    finally:
+        elevenlabs_pool.semaphore.release()
+
+    # Only reached once the stream completed, so a failed or abandoned synthesis is never cached
+    if segment_audio:
+        await asyncio.to_thread(_tts_cache_put, cache_key, segment_audio)
+
+
+# Everything besides voice and text that changes the generated audio; fixed at import like the settings themselves
+_TTS_CACHE_KEY_PREFIX = "\n".join((ELEVEN_MODEL_ID, ELEVEN_OUTPUT_FORMAT, ELEVEN_VOICE_SETTINGS.model_dump_json()))
+
+
+def _tts_cache_key(voice_id: str, text: str) -> str:
+    return hashlib.sha256(f"{_TTS_CACHE_KEY_PREFIX}\n{voice_id}\n{text}".encode()).hexdigest()
 
-            # Generate audio for the current segment's text
-            print(f"  Generating audio for '{text_to_speak[:50]}...' with voice {voice_id_to_use}")
-            
-            # `elevenlabs_client.text_to_speech.convert` returns an iterator of bytes
-            audio_bytes_iterator = elevenlabs_client.text_to_speech.convert(
-                voice_id=voice_id_to_use,
-                output_format="mp3_44100_128", # Consistent high-quality MP3 format
-                text=text_to_speak,
-                model_id=eleven_model_id,
-                voice_settings=eleven_voice_settings,
-            )
-            
-            # Accumulate all bytes from the iterator
-            segment_audio_bytes = b"".join([chunk for chunk in audio_bytes_iterator])
 
-            if not segment_audio_bytes:
-                print(f"Warning: No audio data received from ElevenLabs for segment {segment_count} ({speaker}).")
-                continue # Skip if no audio was generated
+def _podcast_cache_key(tts_jobs: list[tuple[int, str, str, str]]) -> str:
+    # A podcast is identified by its segments' cache keys in order; the prefix keeps it apart from segment keys
+    segment_keys = [_tts_cache_key(voice_id, text) for _, _, voice_id, text in tts_jobs]
+    return hashlib.sha256("\n".join(["podcast", *segment_keys]).encode()).hexdigest()
 
-            # Load the MP3 bytes into a pydub AudioSegment
-            # pydub needs to know the format of the input bytes.
-            # We use BytesIO to treat the bytes like a file.
+
+# Directory the TTS cache lives in, set at startup by _prepare_tts_cache_dir; None disables the cache
+_tts_cache_dir: str | None = None
+
+
+def _prepare_tts_cache_dir(path: str) -> str | None:
+    """
+    Creates the cache directory (private to this user) if needed and returns its path, or None if it
+    can't be trusted: cached files are served as synthesized audio and their names are derivable from
+    public settings, so a directory someone else owns or can write to could be used to plant audio.
+    """
+    path = os.path.abspath(path)
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        dir_stat = os.lstat(path)
+        if not stat.S_ISDIR(dir_stat.st_mode): # e.g. a symlink planted in its place
+            logger.error("TTS cache path %s is not a directory; TTS caching is disabled.", path)
+            return None
+        if hasattr(os, "getuid"): # POSIX only
+            if dir_stat.st_uid != os.getuid():
+                logger.error("TTS cache directory %s is owned by another user; TTS caching is disabled.", path)
+                return None
+            if dir_stat.st_mode & 0o077:
+                os.chmod(path, 0o700)
+    except OSError as e:
+        logger.error("Could not set up TTS cache directory %s; TTS caching is disabled: %s", path, e)
+        return None
+    return path
+
+
+def _tts_cache_path(cache_key: str) -> str:
+    return os.path.join(_tts_cache_dir, f"{cache_key}.mp3")
+
+
+def _tts_cache_pin(cache_key: str) -> tuple[str, os.stat_result] | None:
+    """
+    Hard-links the cache file to a private name (marking the entry recently used) and returns that
+    path with its stat, for serving it without reading it. The link keeps the audio on disk even if
+    another worker evicts the entry meanwhile; remove it once the response has been sent.
+    """
+    if _tts_cache_dir is None:
+        return None
+    path = _tts_cache_path(cache_key)
+    pinned_path = f"{path}.{secrets.token_hex(8)}.tmp" # Swept with other stale temp files if never removed
+    try:
+        os.link(path, pinned_path)
+        pinned_stat = os.stat(pinned_path)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("Internal: Could not access TTS cache entry %s: %s", cache_key, e)
+        _remove_quietly(pinned_path)
+        return None
+    try:
+        os.utime(path) # Mark as recently used for LRU eviction
+    except OSError: # Evicted right after we linked it; the pinned copy is still servable
+        pass
+    return pinned_path, pinned_stat
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _tts_cache_get(cache_key: str) -> bytes | None:
+    if _tts_cache_dir is None:
+        return None
+    path = _tts_cache_path(cache_key)
+    try:
+        with open(path, "rb") as cache_file:
+            audio = cache_file.read()
+        os.utime(path) # Mark as recently used for LRU eviction
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("Internal: Could not read TTS cache entry %s: %s", cache_key, e)
+        return None
+    return audio
+
+
+# Approximate size of the cache directory as seen by this worker; None until the first write scans it.
+# Writes run in worker threads, so the lock guards the running total and eviction.
+_tts_cache_size: int | None = None
+_tts_cache_size_lock = threading.Lock()
+
+
+def _tts_cache_put(cache_key: str, audio: bytes | bytearray):
+    global _tts_cache_size
+    if _tts_cache_dir is None:
+        return
+    path = _tts_cache_path(cache_key)
+    temp_path = None
+    try:
+        # A unique temp file per write, so concurrent writers of the same key (in any thread or worker) never share one
+        temp_fd, temp_path = tempfile.mkstemp(dir=_tts_cache_dir, suffix=".tmp")
+        with os.fdopen(temp_fd, "wb") as cache_file:
+            cache_file.write(audio)
+        os.replace(temp_path, path) # Atomic, so readers never see a partially written file
+    except OSError as e:
+        logger.warning("Internal: Could not write TTS cache entry %s: %s", cache_key, e)
+        if temp_path is not None:
+            _remove_quietly(temp_path)
+        return
+
+    with _tts_cache_size_lock:
+        if _tts_cache_size is not None:
+            _tts_cache_size += len(audio)
+        if _tts_cache_size is None or _tts_cache_size > TTS_CACHE_MAX_BYTES:
+            _tts_cache_size = _evict_tts_cache()
+
+
+def _evict_tts_cache() -> int:
+    """
+    Deletes least-recently-used entries until the cache directory is under 90% of its cap, plus temp files
+    left behind by writes that never finished (e.g. a killed worker); returns its new size.
+    """
+    entries = []
+    stale_before = time.time() - TTS_CACHE_STALE_TEMP_SECONDS
+    with os.scandir(_tts_cache_dir) as dir_entries:
+        for entry in dir_entries:
+            if entry.name.endswith(".tmp"):
+                try:
+                    if entry.stat().st_mtime < stale_before:
+                        os.remove(entry.path)
+                except FileNotFoundError: # Renamed into place or removed meanwhile
+                    pass
+                except OSError as e:
+                    logger.warning("Internal: Could not remove stale TTS cache temp file %s: %s", entry.path, e)
+            elif entry.name.endswith(".mp3"):
+                try:
+                    entry_stat = entry.stat()
+                except FileNotFoundError: # Evicted by another worker meanwhile
+                    continue
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+    if total_size > TTS_CACHE_MAX_BYTES:
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= TTS_CACHE_MAX_BYTES * 0.9: # Leave headroom so we don't evict on every write
+                break
             try:
-                segment_audio = AudioSegment.from_file(io.BytesIO(segment_audio_bytes), format="mp3")
-                combined_audio += segment_audio
-                print(f"  Segment {segment_count} audio ({len(segment_audio_bytes)} bytes) appended.")
-            except Exception as pydub_err:
-                print(f"Error processing audio for segment {segment_count} with pydub: {pydub_err}. Skipping segment.")
-                # Potentially log more details about segment_audio_bytes here if it's consistently failing
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Internal: Could not evict TTS cache entry %s: %s", path, e)
                 continue
-        
-        if len(combined_audio) == 0:
-            print("API Error: No audio was combined. All segments might have failed or were empty.")
-            raise HTTPException(status_code=500, detail="Failed to generate any audio content from the provided segments.")
-
-        # Export the combined audio to an in-memory MP3 file (BytesIO buffer)
-        final_audio_buffer = io.BytesIO()
-        combined_audio.export(final_audio_buffer, format="mp3")
-        final_audio_buffer.seek(0) # Rewind the buffer to the beginning for reading
+            total_size -= size
+        logger.info("Internal: TTS cache evicted down to %d bytes.", total_size)
+    return total_size
 
-        print("API: Successfully combined audio segments. Streaming final MP3.")
-        
-        # Suggest a filename for the download
-        # For simplicity, not making filename dynamic based on topic here as topic isn't passed to this endpoint
-        headers = {
-            "Content-Disposition": "attachment; filename=\"generated_podcast.mp3\""
-        }
-        return StreamingResponse(final_audio_buffer, media_type="audio/mpeg", headers=headers)
 
-    except HTTPException: # Re-raise HTTPExceptions directly
+@provider_retry
+async def _open_segment_stream(elevenlabs_pool: ClientPool, voice_id: str, text: str):
+    # The /stream endpoint sends audio as soon as the first frames are generated, rather than after the
+    # whole segment. Only opening the stream (up to the first chunk) is retried; once bytes have gone
+    # out to the client a failure can't be replayed transparently. The semaphore slot is taken per
+    # attempt and stays held on success; the caller releases it once the stream is drained.
+    await elevenlabs_pool.semaphore.acquire()
+    try:
+        audio_stream = elevenlabs_pool.next().text_to_speech.convert_as_stream(
+            voice_id=voice_id,
+            output_format=ELEVEN_OUTPUT_FORMAT,
+            text=text,
+            model_id=ELEVEN_MODEL_ID,
+            voice_settings=ELEVEN_VOICE_SETTINGS,
+            optimize_streaming_latency=3, # Start returning audio sooner (keeps text normalization on)
+        )
+        return await anext(audio_stream, b""), audio_stream
+    except BaseException:
+        elevenlabs_pool.semaphore.release()
         raise
-    except Exception as e:
-        print(f"API: Unexpected error in /generate-podcast-audio: {e}")
-        # Check for specific ElevenLabs errors if possible, e.g., quota
-        error_message = str(e)
-        if "quota" in error_message.lower() or "limit" in error_message.lower() or "exceeded" in error_message.lower():
-            raise HTTPException(status_code=429, detail=f"ElevenLabs API Error (Quota/Limit): {error_message}")
-        if "Unauthenticated" in error_message or "Authentication" in error_message:
-             raise HTTPException(status_code=401, detail=f"ElevenLabs Authentication Error: {error_message}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate podcast audio: {error_message}")
+
+
+# A "Host:" / "Guest:" speaker label at the start of a line
+_SPEAKER_LABEL_RE = re.compile(r"^[^\S\n]*(Host|Guest):", re.IGNORECASE | re.MULTILINE)
+# A line break plus the whitespace (including blank lines) around it
+_LINE_BREAK_RE = re.compile(r"\s*\n\s*")
 
 
 def _parse_script_into_segments(raw_script_text: str) -> list[dict[str, str]]:
-    segments = []
-    # Regex to find "Speaker:" followed by text.
-    # It captures the speaker (Host or Guest) and the subsequent text until the next speaker label or end of string.
-    
-    # Pattern looks for "Host:" or "Guest:", captures the name, then captures all text
-    # until the next "Host:" or "Guest:" or the end of the string.
-    # We'll split by lines first to handle multi-line text for a single speaker.
     # [ {'speker ': H|G, "text": "script"}, {}, {}]
-    current_speaker = None
-    current_lines = []
-    
-    # Split the raw script into lines to process
-    script_lines = raw_script_text.strip().split('\n')
+    # One split on the "Host:" / "Guest:" labels (which must start a line) yields
+    # [preamble, speaker, text, speaker, text, ...]; anything before the first label is dropped.
+    parts = _SPEAKER_LABEL_RE.split(raw_script_text.strip())
+
+    segments = []
+    for speaker, text in zip(parts[1::2], parts[2::2]):
+        # Strip every line and drop blank ones, keeping the line breaks between them
+        text = _LINE_BREAK_RE.sub("\n", text.strip())
+        if text: # Filter out any segments with empty text, just in case
+            segments.append({"speaker": speaker.capitalize(), "text": text}) # "Host" or "Guest"
+
+    logger.debug("Internal: Parsed into %d segments.", len(segments))
+    return segments
+
+
+def _stopped_at_max_tokens(response) -> bool:
+    """True if Gemini ended the (last chunk of the) response at max_output_tokens, i.e. the script may be cut off."""
+    if response.candidates and response.candidates[0].finish_reason == genai.protos.Candidate.FinishReason.MAX_TOKENS:
+        logger.warning("Internal: Gemini stopped at max_output_tokens; the script may be cut off and won't be cached.")
+        return True
+    return False
+
 
-    for line in script_lines:
-        line = line.strip() # Remove leading/trailing whitespace from the line
-        if not line: # Skip empty lines
+def _build_script_prompt(topic: str) -> str:
+    # Dynamic content goes last; everything before it is the cacheable static prefix
+    return f"{_SCRIPT_PROMPT_PREFIX}{topic}\n"
+
+
+async def _stream_script(gemini_client: GeminiClient, topic: str):
+    """
+    Streams the script from Gemini (or the script cache), yielding `("delta", text)` for each new piece
+    of text and `("segment", {"speaker", "text"})` for each parsed segment as soon as it is complete.
+    """
+    cached_script, topic_embedding_task = await _script_cache.lookup(topic)
+    if cached_script is not None:
+        raw_script_text, segments = cached_script
+        yield "delta", raw_script_text
+        for segment in segments:
+            yield "segment", segment
+        return
+
+    prompt_for_gemini = _build_script_prompt(topic)
+    logger.info("Internal: Streaming script from Google Gemini for topic: %s", topic)
+
+    segmenter = ScriptSegmenter()
+    chunk = None
+    async for chunk in gemini_client.stream(prompt_for_gemini, SCRIPT_GENERATION_CONFIG):
+        try:
+            delta = chunk.text
+        except ValueError: # Chunk without text parts (e.g. only a finish reason)
             continue
+        if delta:
+            yield "delta", delta
+            for segment in segmenter.feed(delta):
+                yield "segment", segment
 
-        # Check if the line starts with a speaker label
-        match = re.match(r"^(Host|Guest):(.*)", line, re.IGNORECASE)
-        if match:
-            # If we have a current speaker and accumulated lines, save the previous segment
-            if current_speaker and current_lines:
-                segments.append({
-                    "speaker": current_speaker,
-                    "text": "\n".join(current_lines).strip() # Join lines and strip again
-                })
-            
-            # Start a new segment
-            current_speaker = match.group(1).strip().capitalize() # "Host" or "Guest"
-            current_lines = [match.group(2).strip()] # Start with the text on the same line as the label
-        elif current_speaker:
-            # This line belongs to the current speaker
-            current_lines.append(line)
-       
-    # Add the last segment if any
-    if current_speaker and current_lines:
-        segments.append({
-            "speaker": current_speaker,
-            "text": "\n".join(current_lines).strip()
-        })
-        
-    # Filter out any segments with empty text, just in case
-    segments = [seg for seg in segments if seg.get("text")]
+    for segment in segmenter.finish():
+        yield "segment", segment
+    # The finish reason arrives with the last chunk
+    if segmenter.segments and not (chunk is not None and _stopped_at_max_tokens(chunk)):
+        await _script_cache.store(topic, topic_embedding_task, (segmenter.text.strip(), segmenter.segments))
 
-    print(f"Internal: Parsed into {len(segments)} segments.")
-    return segments
+
+async def _stream_script_segments(gemini_client: GeminiClient, topic: str):
+    """Streams the script and yields each parsed segment as soon as it is complete."""
+    async for kind, value in _stream_script(gemini_client, topic):
+        if kind == "segment":
+            yield value
 
 
-async def _generate_script_logic(topic: str)-> tuple[str, list[dict[str, str]]]: # Removed type hint for return for now, will add later
-    if not topic or topic.strip() == "":
-        raise ValueError("Topic cannot be empty for script generation.")
-    if not gemini_model:
-        raise RuntimeError("Gemini model not initialized.")
-    print("step1")
+async def _generate_script_logic(gemini_client: GeminiClient, topic: str)-> tuple[str, list[dict[str, str]]]: # Removed type hint for return for now, will add later
     try:
-        prompt_for_gemini = f"""
-        You are an expert podcast scriptwriter tasked with creating an engaging and well-structured conversational script.
-        The podcast features a Host and a Guest discussing the topic: "{topic}".
-
-        Script Requirements:
-
-        1.  Overall Length: The entire podcast should be approximately 3-4 minutes long when spoken (aim for around 450-550 words total for the script).
-        2.  Speaker Labels: Clearly label each line with either "Host:" or "Guest:". Ensure there's a natural back-and-forth.
-        3.  Structure:
-                Start (Host Introduction - approx. 30-60 seconds / 75-100 words):**
-                    Host introduces the podcast show (you can invent a catchy show name related to general topics or the input topic).
-                    Host briefly introduces the main topic.
-                    Host introduces the Guest (you can invent a plausible expert name/title for the Guest based on the topic).
-                Mid (Host & Guest Conversation - approx. 2-3 minutes / 350-400 words):**
-                    A dynamic conversation between the Host and Guest exploring 2-3 key aspects of the topic.
-                    Host should ask insightful questions.
-                    Guest should provide clear, informative, and engaging answers/perspectives.
-                    Ensure a balanced dialogue.
-                End (Host Summary & Call to Action - approx. 30-60 seconds / 50-60 words):**
-                    Host thanks the Guest for their insights.
-                    Host provides a brief summary of the key takeaways from the discussion.
-                    Host includes a call to action (e.g., "What are your thoughts? Find us on social media @[YourPodcastHandle]", "Don't forget to subscribe for more discussions like this.", "Visit our website at [yourwebsite.com] for more resources.").
-                    Host signs off.
-        4.  Readability and Formatting:
-                Use clear, concise language.
-                Ensure each speaker's line starts on a new line after their label (e.g., "Host:\nWelcome to...").
-                Use proper paragraph breaks within longer spoken segments for better visual organization if needed, but primarily focus on the speaker turns.
-                Avoid any meta-commentary about the script itself (e.g., "Here's the script:", "[Transition Music]"). Just provide the raw dialogue with speaker labels.
-
-        Example Snippet of Expected Format:
-
-        Host:
-        Welcome back to "Future Forward," the podcast that decodes tomorrow's trends today! I'm your host, Alex.
-        Today, we're diving deep into {topic}. And to help us navigate this complex subject, we're thrilled to have Dr. Evelyn Reed, a leading researcher in [Guest's relevant field]. Evelyn, welcome to the show!
-
-        Guest:
-        Thanks for having me, Alex! It's a pleasure to be here.
-
-        Host:
-        Evelyn, to start us off, could you give our listeners a foundational understanding of "a key aspect of the topic"?
-
-        Guest:
-        Absolutely. Essentially, "Guest explains key aspect...""
-        It's quite fascinating because...
-
-        ---
-
-        Please generate the full script based on these requirements for the topic: "{topic}"
-        """
+        cached_script, topic_embedding_task = await _script_cache.lookup(topic)
+        if cached_script is not None:
+            return cached_script
 
-        print(f"Internal: Sending script request to Google Gemini for topic: {topic} with new prompt.")
+        prompt_for_gemini = _build_script_prompt(topic)
+
+        logger.info("Internal: Sending script request to Google Gemini for topic: %s", topic)
 
-        generation_config = genai.types.GenerationConfig(
-            # max_output_tokens=1500, # Ensure enough tokens for ~500 words
-            temperature=0.7 # Adjust for creativity vs. factuality
-        )
-        
         # Make sure your gemini_model instance can take generation_config
         # If gemini_model = genai.GenerativeModel('gemini-pro'), it should.
-        response = gemini_model.generate_content(
-            prompt_for_gemini,
-            generation_config=generation_config # Add this
-        )
+        # Uses the native async call so the event loop
+        # keeps serving other requests while we wait on Gemini.
+        response = await gemini_client.submit(prompt_for_gemini, SCRIPT_GENERATION_CONFIG)
 
         if not response.text:
-            print(f"Internal: Gemini response was empty. Prompt feedback: {response.prompt_feedback}")
+            logger.warning("Internal: Gemini response was empty. Prompt feedback: %s", response.prompt_feedback)
             # You can inspect response.candidates[0].finish_reason and safety_ratings here
             finish_reason = response.candidates[0].finish_reason if response.candidates else "UNKNOWN"
             raise RuntimeError(f"Failed to generate script from Gemini (empty response). Finish reason: {finish_reason}")
             
+        truncated = _stopped_at_max_tokens(response)
+
         raw_script_text = response.text.strip()
-        print("Internal: Received raw script from Google Gemini.")
+        logger.debug("Internal: Received raw script from Google Gemini.")
         
         parsed_segments = _parse_script_into_segments(raw_script_text)
         
         if not parsed_segments:
-            print("Warning: Script parsing resulted in no segments. The LLM output might be malformed.")
+            logger.warning("Script parsing resulted in no segments. The LLM output might be malformed.")
+        elif not truncated: # Don't cache malformed or cut-off output; the next request gets a fresh attempt
+            await _script_cache.store(topic, topic_embedding_task, (raw_script_text, parsed_segments))
         # We will parse this `generated_script_text` into segments in the next step (B3)
         # For now, this function will just return the raw script text.
         # The calling endpoint will handle parsing.
         return  raw_script_text, parsed_segments # Return raw script text for now
 
     except Exception as e:
-        print(f"Internal: An unexpected error occurred during script generation: {e}")
+        logger.exception("Internal: An unexpected error occurred during script generation: %s", e)
         raise RuntimeError(f"Internal Gemini Error: {str(e)}")
     
\ No newline at end of file
@@ -2,6 +2,13 @@
 import { useState, useEffect } from 'react';
 import './App.css';
 
+// Must match ScriptRequest.topic's max_length in backend/main.py
+const MAX_TOPIC_LENGTH = 500;
+
+// FastAPI validation errors (422) send `detail` as a list of {loc, msg, ...} objects rather than a string
+const formatErrorDetail = (detail) =>
+  Array.isArray(detail) ? detail.map((item) => item.msg || JSON.stringify(item)).join('; ') : detail;
+
 function App() {
   const [topic, setTopic] = useState('');
   
@@ -46,7 +53,7 @@ function App() {
         let errorDetail = `HTTP error! status: ${response.status} ${response.statusText}`;
         try {
             const errorData = await response.json();
-            errorDetail = errorData.detail || errorDetail;
+            errorDetail = formatErrorDetail(errorData.detail) || errorDetail;
         } catch (jsonError) {
             console.warn("Could not parse error response as JSON:", jsonError);
         }
@@ -99,7 +106,7 @@ function App() {
         let errorDetail = `HTTP error! status: ${response.status} ${response.statusText}`;
         try {
             const errorData = await response.json();
-            errorDetail = errorData.detail || errorDetail;
+            errorDetail = formatErrorDetail(errorData.detail) || errorDetail;
         } catch (jsonError) {
             console.warn("Could not parse error response as JSON:", jsonError);
         }
@@ -146,6 +153,7 @@ function App() {
               onChange={(e) => setTopic(e.target.value)}
               placeholder="e.g., The impact of AI on daily life"
               rows={3}
+              maxLength={MAX_TOPIC_LENGTH}
               required
               disabled={isLoadingScript || isLoadingAudio}
             />